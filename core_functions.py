@@ -8,16 +8,91 @@ This file contains the following functions:
     * fetch_conversion_rates        - fetches EUR to NOK conversion rates from Norges Bank
 """
 # Standard Library Imports
+import json
 import logging
+import os
+import time
+from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # Imports for fetching data from ENTSO-E
 from entsoe import EntsoePandasClient
+from entsoe.exceptions import NoMatchingDataError
+from entsoe.mappings import Area, lookup_area
+import numpy as np
 import pandas as pd
 # Imports for fetching data from Norges Bank
 import requests
+# Optional faster JSON decoding of the Norges Bank responses
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Upper limit on the number of concurrent requests sent to ENTSO-E
+MAX_CONCURRENT_REQUESTS = 8
+
+# Longer periods are split into chunks that are requested concurrently. ENTSO-E returns at
+# most 100 daily documents per request, and entsoe-py extends each query by one day at both ends
+DAYS_PER_REQUEST = 98
+
+# Accepted aliases for the resolutions prices can be resampled to
+_HOURLY_RESOLUTIONS = frozenset({"60min", "60", "h", "H", "hour", "HOUR", "hourly"})
+_QUARTER_HOURLY_RESOLUTIONS = frozenset({"15min", "15", "q", "Q", "quarter", "QUARTER", "quarterly"})
+
+# Time zone of the returned prices and exchange rates
+_TIME_ZONE = "Europe/Oslo"
+
+# Norges Bank API endpoint for daily EUR -> NOK exchange rates
+_NORGES_BANK_EUR_NOK_URL = "https://data.norges-bank.no/api/data/EXR/B.EUR.NOK.SP"
+
+# Exchange rates for past dates do not change, so fetched rates are cached per date range
+_EXCHANGE_RATES_CACHE_SIZE = 64
+# Fetched rates are also cached on disk, so repeated runs of the CLI skip the request. The
+# rates are published once per business day, so cached files expire after a few hours.
+# Setting the environment variable below to a non-empty value disables the disk cache
+_EXCHANGE_RATES_CACHE_DIR_NAME = "entsoe-price-extractor"
+_DISABLE_DISK_CACHE_ENV_VAR = "ENTSOE_PRICE_EXTRACTOR_NO_CACHE"
+_EXCHANGE_RATES_CACHE_TTL_SECONDS = 6 * 60 * 60
+# Number of days before the start date included in the query, covering weekends and holidays
+_EXCHANGE_RATE_LOOKBACK_DAYS = 7
+_exchange_rates_cache = {}
+
+
+def _create_session():
+    """
+    Creates a requests session with a connection pool large enough for the concurrent
+    ENTSO-E requests, and retries on rate limiting and transient server errors.
+    """
+    session = requests.Session()
+    retries = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared session, so connections to ENTSO-E and Norges Bank are kept alive and reused
+# across requests and calls
+_SESSION = _create_session()
+
+
+@lru_cache(maxsize=8)
+def _get_client(token: str) -> EntsoePandasClient:
+    """
+    Returns an ENTSO-E client for the given token, reusing the client between calls.
+    """
+    return EntsoePandasClient(api_key=token, session=_SESSION)
+
 
 def fetch_day_ahead_prices(
         bidding_zone_list: list[str],
@@ -51,10 +126,10 @@ def fetch_day_ahead_prices(
         hourly day-ahead prices for the specified bidding zones and date range.
     """
 
-    client = EntsoePandasClient(api_key=token)
+    client = _get_client(token)
 
-    start_dt_cet = pd.Timestamp(start_time, tz="Europe/Oslo")
-    end_dt_cet = pd.Timestamp(end_time, tz="Europe/Oslo")
+    start_dt_cet = pd.Timestamp(start_time, tz=_TIME_ZONE)
+    end_dt_cet = pd.Timestamp(end_time, tz=_TIME_ZONE)
 
     if end_dt_cet < start_dt_cet:
         logger.warning(
@@ -62,23 +137,53 @@ def fetch_day_ahead_prices(
         logger.info("Returning without value.")
         return
 
-    datetime_index = pd.date_range(start=start_dt_cet, end=end_dt_cet, freq='15min', inclusive='left')
-    # Dataframe to store the prices. Timeseries from ENTSO-E are breakpoint like, meaning they are
-    # easily aggergated and filled with forward fill if needed
-    full_price_df = pd.DataFrame(index=datetime_index)
+    # Bidding zones are resolved to their ENTSO-E areas (EIC codes) once, before any request is made
+    areas = {bidding_zone: lookup_area(bidding_zone) for bidding_zone in bidding_zone_list}
+    periods = _split_period(start_dt_cet, end_dt_cet)
+
+    # The requests are network bound, so every (bidding zone, period) pair is fetched
+    # concurrently and assembled in the original order once all responses are in
+    chunks_by_zone = {bidding_zone: {} for bidding_zone in bidding_zone_list}
+    max_workers = max(1, min(len(areas) * len(periods), MAX_CONCURRENT_REQUESTS))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_zone, client, area, period_start, period_end): (bidding_zone, period_number)
+            for bidding_zone, area in areas.items()
+            for period_number, (period_start, period_end) in enumerate(periods)
+        }
+        try:
+            for future in as_completed(futures):
+                bidding_zone, period_number = futures[future]
+                chunks_by_zone[bidding_zone][period_number] = future.result()
+        except BaseException:
+            # Stop sending the queued requests once one of them has failed
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    series_by_zone = {}
+    for bidding_zone, chunks in chunks_by_zone.items():
+        zone_chunks = [chunks[period_number] for period_number in sorted(chunks) if chunks[period_number] is not None]
+        if len(zone_chunks) == 0:
+            raise NoMatchingDataError(f"No day-ahead prices found for {bidding_zone}")
+        series_by_zone[bidding_zone] = pd.concat(zone_chunks)
 
-    for bidding_zone in bidding_zone_list:
-        entsoe_py_df = client.query_day_ahead_prices(bidding_zone, start=start_dt_cet, end=end_dt_cet)
-        full_price_df[f"{bidding_zone}"] = entsoe_py_df
+    datetime_index = pd.date_range(start=start_dt_cet, end=end_dt_cet, freq='15min', inclusive='left')
+    # Dataframe to store the prices. The series are joined once with concat and aligned to the
+    # 15 min grid in a single reindex. Timeseries from ENTSO-E are breakpoint like, meaning they
+    # are easily aggergated and filled with forward fill if needed
+    full_price_df = pd.concat(
+        {f"{bidding_zone}": series_by_zone[bidding_zone] for bidding_zone in bidding_zone_list},
+        axis=1,
+        sort=False,
+    ).reindex(datetime_index)
 
     if resolution != "SDAC_MTU":
         full_price_df = full_price_df.ffill()
         logger.info(f"Resampling prices to resolution {resolution}")
-        if resolution in ["60min", "60", "h", "H", "hour", "HOUR", "hourly"]:
+        # The prices are already on the 15 min grid, so 15 min resolution only needs the forward fill
+        if resolution in _HOURLY_RESOLUTIONS:
             full_price_df = full_price_df.resample('h').mean()
-        elif resolution in ["15min", "15", "q", "Q", "quarter", "QUARTER", "quarterly"]:
-            full_price_df = full_price_df.resample('15min').mean()
-        else:
+        elif resolution not in _QUARTER_HOURLY_RESOLUTIONS:
             logger.warning(f"Resolution {resolution} not supported. Continuing with SDAC_MTU")
 
     # ENTSO-E prices are in EUR/MWh. Conversion to NOK/kWh possible using
@@ -95,13 +200,43 @@ def fetch_day_ahead_prices(
         else:
             logger.info("Currency conversion rates succesfully retrived.")
             exchange_rates_sdac_mtu = exchange_rates.reindex(full_price_df.index, method='ffill')
-            full_price_df = full_price_df.mul(exchange_rates_sdac_mtu, axis=0) / 1000
+            # Scale in place with one broadcast, EUR/MWh * NOK/EUR * 0.001 MWh/kWh
+            full_price_df *= (exchange_rates_sdac_mtu.to_numpy() * 0.001)[:, None]
 
     full_price_df.attrs['unit'] = 'EUR/MWh' if not convert_to_nok else 'NOK/kWh'
 
     return full_price_df
 
 
+def _split_period(start: pd.Timestamp, end: pd.Timestamp):
+    """
+    Splits a period into consecutive chunks of at most DAYS_PER_REQUEST days.
+
+    Returns:
+        list[tuple[pd.Timestamp, pd.Timestamp]]: The (start, end) of each chunk.
+    """
+    chunk_starts = list(pd.date_range(start=start, end=end, freq=pd.DateOffset(days=DAYS_PER_REQUEST), inclusive='left'))
+    return list(zip(chunk_starts, chunk_starts[1:] + [end])) if chunk_starts else [(start, end)]
+
+
+def _fetch_zone(client: EntsoePandasClient, area: Area, start: pd.Timestamp, end: pd.Timestamp):
+    """
+    Fetches day-ahead prices for a single bidding zone and period. Used as the worker
+    task when bidding zones and periods are queried concurrently.
+
+    Returns:
+        pd.Series: The day-ahead prices in [start, end), or None if ENTSO-E has no data
+        for the period.
+    """
+    try:
+        prices = client.query_day_ahead_prices(area, start=start, end=end)
+    except NoMatchingDataError:
+        logger.info(f"No day-ahead prices for {area.name} between {start} and {end}")
+        return None
+    # The end point is included by entsoe-py, and is the start of the next period
+    return prices[prices.index < end]
+
+
 def fetch_conversion_rates(start_date: str, end_date: str):
     """
     Fetches currency conversion rates from the Norges Bank API for a specified date range.
@@ -116,13 +251,93 @@ def fetch_conversion_rates(start_date: str, end_date: str):
                 If the start_date falls on a weekend, the previous Friday is included in the
                 returned series. If the end_date falls on a weekend, the following Monday is
                 included in the returned series.
+                Results are cached per (start_date, end_date) for the lifetime of the process,
+                and on disk for _EXCHANGE_RATES_CACHE_TTL_SECONDS, unless the environment
+                variable ENTSOE_PRICE_EXTRACTOR_NO_CACHE is set.
     """
+    cache_key = (start_date, end_date)
+    if cache_key in _exchange_rates_cache:
+        logger.info(f"Using cached conversion rates for period {start_date} and {end_date}")
+        return _exchange_rates_cache[cache_key].copy()
 
-    # Specify the API endpoints and parameters
-    norges_bank_base_url = "https://data.norges-bank.no/api/data/EXR/B.EUR.NOK.SP"
+    exchange_rates = _load_cached_conversion_rates(start_date, end_date)
+    if exchange_rates is None:
+        exchange_rates = _query_conversion_rates(start_date, end_date)
+        if exchange_rates is not None:
+            _store_cached_conversion_rates(start_date, end_date, exchange_rates)
+
+    # Only successful results are cached, so failed requests are retried on the next call
+    if exchange_rates is not None:
+        if len(_exchange_rates_cache) >= _EXCHANGE_RATES_CACHE_SIZE:
+            # Evict the oldest entry
+            del _exchange_rates_cache[next(iter(_exchange_rates_cache))]
+        _exchange_rates_cache[cache_key] = exchange_rates.copy()
+
+    return exchange_rates
+
+
+def _conversion_rates_cache_path(start_date: str, end_date: str):
+    """
+    Returns the path of the cached exchange rates for the period, or None if the disk cache
+    is disabled or there is no cache directory (no XDG_CACHE_HOME and no home directory).
+    """
+    if os.environ.get(_DISABLE_DISK_CACHE_ENV_VAR):
+        return None
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        try:
+            cache_home = Path.home() / ".cache"
+        except RuntimeError:
+            return None
+    return Path(cache_home) / _EXCHANGE_RATES_CACHE_DIR_NAME / f"eur_nok_{start_date}_{end_date}.json"
+
+
+def _load_cached_conversion_rates(start_date: str, end_date: str):
+    """
+    Loads exchange rates cached on disk by a previous run. Returns None if there is no
+    cached file, it has expired, or it cannot be read.
+    """
+    cache_path = _conversion_rates_cache_path(start_date, end_date)
+    if cache_path is None:
+        return None
+    try:
+        if time.time() - cache_path.stat().st_mtime > _EXCHANGE_RATES_CACHE_TTL_SECONDS:
+            return None
+        with open(cache_path, "r", encoding="utf-8") as cache_file:
+            cached_rates = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+    logger.info(f"Using conversion rates cached at {cache_path}")
+    exchange_rates = pd.Series(list(cached_rates.values()), dtype=np.float64)
+    exchange_rates.index = pd.to_datetime(list(cached_rates.keys()), format="%Y-%m-%d").tz_localize(_TIME_ZONE)
+    return exchange_rates
+
+
+def _store_cached_conversion_rates(start_date: str, end_date: str, exchange_rates: pd.Series):
+    """
+    Stores exchange rates on disk for later runs. Failing to write the cache is not an error.
+    """
+    cache_path = _conversion_rates_cache_path(start_date, end_date)
+    if cache_path is None:
+        return
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as cache_file:
+            json.dump(dict(zip(exchange_rates.index.strftime("%Y-%m-%d"), exchange_rates.tolist())), cache_file)
+    except OSError as error:
+        logger.debug(f"Could not cache conversion rates at {cache_path}: {error}")
+
+
+def _query_conversion_rates(start_date: str, end_date: str):
+    """
+    Queries the Norges Bank API for EUR -> NOK exchange rates. See fetch_conversion_rates.
+    """
+
+    # Specify the API parameters
     norges_bank_payload = {"format": "sdmx-json"}
 
-    # Check if start_date and end_date fall on a weekend
+    # Parse the requested period
     start_datetime_query = datetime.strptime(start_date, "%Y-%m-%d")
     end_datetime_query = datetime.strptime(end_date, "%Y-%m-%d")
 
@@ -133,49 +348,15 @@ def fetch_conversion_rates(start_date: str, end_date: str):
         logger.info("Returning without value.")
         return
 
-    if start_datetime_query.weekday() >= 5:
-        # Adjust start_date to the previous Friday
-        start_datetime_query -= timedelta(days=start_datetime_query.weekday() - 4)
-
-    max_attempts = 4
-    success = False
-    # Need to have data on the first date to aviod NaNs in the first part of the
-    # returned pandas dataframe. Try 4 requests, extending one day into the past
-    # for each try
-    for attempt in range(max_attempts):
-        if attempt > 0:
-            start_datetime_query -= timedelta(days=1)
-
-        # Updating API query parameters
-        norges_bank_payload.update({
-            "startPeriod": start_datetime_query.strftime("%Y-%m-%d"),
-            "endPeriod": start_datetime_query.strftime("%Y-%m-%d"),
-        })
-
-        # Send a GET request to Norges Bank for currency conversion
-        norges_bank_response = requests.get(
-            norges_bank_base_url, params=norges_bank_payload, timeout=20
-        )
-        if norges_bank_response.status_code == 200:
-            success = True
-            break
-        else:
-            logger.warning(f"No valid exhange rates on day {start_datetime_query}. Trying one day prior.")
-
-    if not success:
-        logger.error(f"Not possible to retrive a first date with currency data starting from {start_date}. "
-                     f"Returning None")
-        logger.info(f"Last API Request: {norges_bank_response.url}")
-        return None
-
-    # Found a first day with valid exchange rate data. Now querying the full period
-    start_date_query = start_datetime_query.strftime("%Y-%m-%d")
-    end_datetime_query = datetime.strptime(end_date, "%Y-%m-%d")
+    # Norges Bank only publishes rates on business days. To have a rate for the first date,
+    # the period is queried from a few days earlier in a single request, and the last
+    # observation before start_date is carried forward
+    start_date_query = (start_datetime_query - timedelta(days=_EXCHANGE_RATE_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
     end_date_query = end_datetime_query.strftime("%Y-%m-%d")
     # Updating API query parameters
     norges_bank_payload.update({"startPeriod": start_date_query, "endPeriod": end_date_query})
     # Performing request
-    norges_bank_response = requests.get(norges_bank_base_url, params=norges_bank_payload, timeout=20)
+    norges_bank_response = _SESSION.get(_NORGES_BANK_EUR_NOK_URL, params=norges_bank_payload, timeout=20)
 
     if norges_bank_response.status_code == 200:
         logger.info(f"Successfully extracted conversion rates for period {start_date_query} and {end_date_query}")
@@ -185,7 +366,10 @@ def fetch_conversion_rates(start_date: str, end_date: str):
         return None
 
     # Unpacking the exhange rates from Norges Bank (if successful response)
-    norges_bank_data = norges_bank_response.json()
+    if orjson is not None:
+        norges_bank_data = orjson.loads(norges_bank_response.content)
+    else:
+        norges_bank_data = norges_bank_response.json()
     if "data" in norges_bank_data and "dataSets" in norges_bank_data["data"]:
         data_sets = norges_bank_data["data"]["dataSets"]
 
@@ -200,25 +384,33 @@ def fetch_conversion_rates(start_date: str, end_date: str):
                 in norges_bank_data["data"]["structure"]["dimensions"]["observation"][0]["values"]
             }
 
-            # Storing exchange rates into a pandas series
-            exchange_rates = pd.Series(index=pd.date_range(start=start_date_query, end=end_date_query, freq="D"))
-            # Combining rates data and obeservation time stamps
-            for rate_key, rate_value in zip(
-                exchange_rate_dates.keys(), currency_exchange_data.values()
-            ):
-                rate_date = exchange_rate_dates[rate_key]
-                rate = float(rate_value[0])
-                exchange_rates[rate_date] = rate
-
-            if exchange_rates[start_date:end_date].isna().any():
-                missing_data = exchange_rates[start_date:end_date].isna()
-                missing_indexes = [date.strftime("%Y-%m-%d") for date in missing_data[missing_data].index]
-                logger.warning(f"Missing exchange rate data, using previous days instead. Indexes: {missing_indexes}")
-
-        # Use ffill to fill in missing observations with previous values
-        exchange_rates = exchange_rates.ffill()
-
-        exchange_rates.index = exchange_rates.index.tz_localize('Europe/Oslo')
+            # Combining rates data and obeservation time stamps into a pandas series, and
+            # reindexing to every day of the period. Days without observations (weekends,
+            # holidays) are filled with the previous observation
+            observed_rates = pd.Series(
+                np.asarray([rate_value[0] for rate_value in currency_exchange_data.values()], dtype=np.float64),
+                index=pd.to_datetime(list(exchange_rate_dates.values()), format="%Y-%m-%d"),
+            )
+            exchange_rates = observed_rates.reindex(
+                pd.date_range(start=start_date_query, end=end_date_query, freq="D"), method="ffill"
+            )
+
+            if pd.isna(exchange_rates.loc[start_date]):
+                logger.error(f"Not possible to retrive a first date with currency data starting from {start_date}. "
+                             f"Returning None")
+                logger.info(f"API Request: {norges_bank_response.url}")
+                return None
+
+            if logger.isEnabledFor(logging.WARNING):
+                missing_dates = exchange_rates[start_date:end_date].index.difference(observed_rates.index)
+                if len(missing_dates) > 0:
+                    missing_indexes = [date.strftime("%Y-%m-%d") for date in missing_dates]
+                    logger.warning(f"Missing exchange rate data, using previous days instead. Indexes: {missing_indexes}")
+        else:
+            logger.error("No data sets in Norges Bank API response. Returning None")
+            return None
+
+        exchange_rates.index = exchange_rates.index.tz_localize(_TIME_ZONE)
 
         # Return values only for the originally requested time period
         return exchange_rates[start_date:end_date]
@@ -9,21 +9,24 @@ This file contains the following functions:
 import os
 import argparse
 import logging
-import pandas as pd
-from dotenv import dotenv_values
-import core_functions
+from dotenv import load_dotenv
 import utils
 
 
 PLOTLY_SOCKET_SAFE = True
 
-pd.options.plotting.backend = "plotly"
+# Buffer size used when writing the CSV output, to keep the number of write calls low
+CSV_WRITE_BUFFER_SIZE = 1 << 20
 
-# Load the environmental variables from the .env file
-env_vars = dotenv_values(".env")
+# Plots served with --serve and with more time steps than this are downsampled with
+# plotly-resampler, if installed
+PLOT_RESAMPLE_THRESHOLD = 10000
 
-# Access the token value from the loaded environmental variables
-entso_e_token = env_vars.get("MY_ENTSOE_TOKEN")
+# Load the environmental variables from the .env file, without overriding variables already set
+load_dotenv()
+
+# Access the token value from the environment
+entso_e_token = os.environ.get("MY_ENTSOE_TOKEN")
 
 # Configure the root logger
 logging_format = "%(asctime)s [%(levelname)s][%(name)s] %(message)s"
@@ -45,7 +48,7 @@ def main():
     parser = argparse.ArgumentParser(
         description="Script to extract prices from entso-e transparancy platform.")
     parser.add_argument('-a', '--bidding_zone', type=str,
-                        help='Name of bidding zones or keywords all, nordics or norway', default='norway', nargs='*')
+                        help='Name of bidding zones or keywords all, nordics, norway, denmark, sweden, baltics or cwe', default='norway', nargs='*')
     parser.add_argument('-s', '--start', type=str,
                         help='Start date. Optional (default: "DAY"). Format "yyyy-mm-dd" or BASE +/- RELATVE. Example "2024-01-01", "DAY-2D", "YEAR", "WEEK-D".', default="DAY", nargs='?')
     parser.add_argument('-e', '--end', type=str,
@@ -54,6 +57,8 @@ def main():
                         help='Fetch EUR->NOK conversion rates and return prices as NOK/kWh.')
     parser.add_argument('-p', '--plot', action='store_true',
                         help='Make an interactive plot using the plotly package')
+    parser.add_argument('--serve', action='store_true',
+                        help='Serve the plot from a local server instead of saving it to day_ahead_prices.html. Long periods are downsampled when plotly-resampler is installed')
     parser.add_argument('-o', '--output', type=str, default="",
                         help='Path of output file. Example ./output/prices.csv')
     parser.add_argument('-r', '--resolution', type=str, default="SDAC_MTU",
@@ -62,6 +67,7 @@ def main():
 
     convert_to_nok = args.convert_to_nok
     plot_prices = args.plot
+    save_plot_html = PLOTLY_SOCKET_SAFE and not args.serve
     start_date, end_date = utils.convert_date_range(args.start, args.end)
     bidding_zone_input = args.bidding_zone
     output_file_path = args.output
@@ -73,6 +79,9 @@ def main():
         logger.error("No valid bidding zones fetched. Exiting.")
         return
 
+    # Imported here, so --help and invalid input do not pay for importing entsoe-py and requests
+    import core_functions
+
     prices = core_functions.fetch_day_ahead_prices(
         bidding_zones,
         start_date,
@@ -89,7 +98,8 @@ def main():
     if len(output_file_path) > 0:
         if os.path.exists(os.path.dirname(output_file_path)):
             logger.info(f"Saving results to file at {output_file_path}")
-            prices.to_csv(output_file_path, sep=';')
+            with open(output_file_path, 'w', buffering=CSV_WRITE_BUFFER_SIZE, newline='') as output_file:
+                prices.to_csv(output_file, sep=';')
         else:
             logger.warning(f"Folder {os.path.dirname(output_file_path)} does not exists. No file stored.")
 
@@ -97,8 +107,12 @@ def main():
         price_min = prices.min().min()
         price_max = prices.max().max()
         logger.info("Plotting results")
+        # Imported here, as only plotting needs them. Setting the backend imports plotly
+        import numpy as np
+        import pandas as pd
+        pd.options.plotting.backend = "plotly"
 
-        # Extend the prices DataFrame by repeating the last value for an additional hour
+        # Extend the plot by repeating the last value for an additional time step
         last_index = prices.index[-1]
         second_last_index = prices.index[-2]
         time_step = last_index - second_last_index
@@ -106,11 +120,15 @@ def main():
         # Extend by one time step
         new_index = last_index + time_step
 
-        last_row = prices.iloc[-1]
-        extended_prices = pd.concat([prices, pd.DataFrame([last_row], index=[new_index])])
-        extended_prices = extended_prices.ffill()
-
-        plot = extended_prices.plot(kind='line', line_shape='hv')
+        # Forward fill gaps (e.g. hourly prices on the 15 min grid) so they are drawn as steps
+        plot_prices_df = prices.ffill() if prices.isna().to_numpy().any() else prices
+        plot = plot_prices_df.plot(kind='line', line_shape='hv')
+        # Repeat the last value of each trace at the extra time step, so the last step is drawn.
+        # Plotly stores the x values as local wall clock times
+        new_x = np.datetime64(new_index.tz_localize(None))
+        for trace in plot.data:
+            trace.x = np.append(trace.x, new_x)
+            trace.y = np.append(trace.y, trace.y[-1])
         plot.update_layout(
             title='Day ahead clearing price',
             xaxis_title='',
@@ -131,11 +149,42 @@ def main():
                 new_index
             ]
         )
-        if PLOTLY_SOCKET_SAFE:
+
+        if save_plot_html:
+            # The saved file has no server to resample the data when zooming, so it keeps the
+            # full resolution figure
             logger.info("Plot saved to day_ahead_prices.html")
             plot.write_html("day_ahead_prices.html", auto_open=True)
-        else:
-            plot.show()
+            return
+
+        # Large plots are served by a dash app that downsamples the data and resamples the visible
+        # range when zooming, so the browser only has to draw the visible samples
+        if len(prices) > PLOT_RESAMPLE_THRESHOLD:
+            try:
+                import plotly.graph_objects as go
+                from plotly_resampler import FigureResampler
+                from plotly_resampler.aggregation import MinMaxLTTB
+            except ImportError:
+                logger.info(f"Plotting {len(prices)} points. Install plotly-resampler to downsample large plots.")
+            else:
+                # The traces are added with the time zone aware index, as the wall clock x values
+                # are not monotonic when the clocks are turned back. The legend keeps the plain
+                # bidding zone names
+                resampled_plot = FigureResampler(
+                    go.Figure(layout=plot.layout),
+                    convert_existing_traces=False,
+                    default_n_shown_samples=2000,
+                    default_downsampler=MinMaxLTTB(),
+                    resampled_trace_prefix_suffix=("", ""),
+                    show_mean_aggregation_size=False,
+                )
+                extended_index = plot_prices_df.index.append(pd.DatetimeIndex([new_index]))
+                for trace in plot.data:
+                    resampled_plot.add_trace(trace, hf_x=extended_index, hf_y=trace.y)
+                resampled_plot.show_dash(mode='external')
+                return
+
+        plot.show()
 
 
 if __name__ == "__main__":
@@ -1,15 +1,19 @@
 import logging
-from dotenv import dotenv_values
+import os
+import sys
+import warnings
+from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
 import core_functions
 import utils
 
 
-# Load the environmental variables from the .env file
-env_vars = dotenv_values(".env")
+# Load the environmental variables from the .env file, without overriding variables already set
+load_dotenv()
 
-# Access the token value from the loaded environmental variables
-entso_e_token = env_vars.get("MY_ENTSOE_TOKEN")
+# Access the token value from the environment
+entso_e_token = os.environ.get("MY_ENTSOE_TOKEN")
 
 # Configure the root logger
 logging_format = "%(asctime)s [%(levelname)s][%(name)s] %(message)s"
@@ -17,69 +21,81 @@ logging.basicConfig(level=logging.INFO, format=logging_format)
 logger = logging.getLogger(__name__)
 
 
-# Set the basic input to be used by fetch_day_ahead_prices
-# start_time = "2024-12-12"
-# end_time = "2024-12-13"
-start_time = "DAY"
-end_time = "LAST_SDAC"
-
-start_date, end_date = utils.convert_date_range(start_time, end_time)
-
-bidding_zones = ["DE", "nordics"]
-convert_to_nok = False
-
-# Validate the bidding zone list (not strictly nessecary)
-bidding_zones_valid = utils.get_valid_bidding_zones(bidding_zones)
-
-# Run the fetch_day_ahead_prices method and store results in the pandas dataframe prices
-prices = core_functions.fetch_day_ahead_prices(
-    bidding_zones_valid, start_date, end_date, entso_e_token, convert_to_nok=convert_to_nok, resolution="60min"
-)
-
-
 def print_price_analysis(prices):
-    # Ensure a DatetimeIndex, get the calendar date of the last timestamp,
-    # and select all rows for that date.
+    # Ensure a DatetimeIndex, get the start of the calendar date of the last timestamp,
+    # and select all rows for that date. The index is sorted, so the first row of the
+    # date is found by binary search and the rows are sliced by position.
     prices.index = pd.to_datetime(prices.index)
-    last_date = prices.index[-1].date()
-    prices_last_24h = prices[prices.index.date == last_date]
+    last_date_start = prices.index[-1].normalize()
+    prices_last_24h = prices.iloc[prices.index.searchsorted(last_date_start):]
+
+    # The report is collected line by line and written to stdout in one go
+    lines = []
 
     # Print header
-    print(f"\nPrices on {prices.index[-1].strftime('%Y-%m-%d')}:")
+    lines.append(f"\nPrices on {prices.index[-1].strftime('%Y-%m-%d')}:")
     col_width = 12
     left_label_width = 23
     separator = "-" * (left_label_width + col_width * (len(prices.columns) + 1))
-    print(separator)
+    lines.append(separator)
 
-    # Header row with fixed-width columns
-    header = "Delivery period".ljust(left_label_width) + " ".join(col.center(col_width) for col in prices.columns)
+    # Header row with fixed-width columns. The column and unit parts are shared by both sections
+    column_headers = " ".join(col.center(col_width) for col in prices.columns)
     unit_row = "".ljust(left_label_width) + " ".join(f"[{prices.attrs['unit']}]".ljust(col_width) for _ in prices.columns)
-    print(header)
-    print(unit_row)
-    print(separator)
-
-    # Print hourly/15-min values
-    for i in range(len(prices_last_24h)):
-        start_time = f"{prices_last_24h.index[i].hour:02.0f}:{prices_last_24h.index[i].minute:02.0f}"
-        next_time = prices_last_24h.index[i] + pd.Timedelta(minutes=15 if len(prices) >= 96 else 60)
-        end_time = f"{next_time.hour:02.0f}:{next_time.minute:02.0f}"
-        values = "     ".join(f"{prices_last_24h[col].iloc[i]:8.2f}" for col in prices_last_24h.columns)
-        print(f"{start_time} - {end_time}".ljust(left_label_width) + f"{values}")
+    lines.append("Delivery period".ljust(left_label_width) + column_headers)
+    lines.append(unit_row)
+    lines.append(separator)
+
+    # Print hourly/15-min values. Delivery period labels and the price cells are formatted
+    # for all rows at once, leaving only the joining of each row in Python
+    time_step = pd.Timedelta(minutes=15 if len(prices) >= 96 else 60)
+    start_times = prices_last_24h.index.strftime('%H:%M')
+    end_times = (prices_last_24h.index + time_step).strftime('%H:%M')
+    cells = np.char.mod('%8.2f', prices_last_24h.to_numpy())
+    for start_time, end_time, row in zip(start_times, end_times, cells):
+        lines.append(f"{start_time} - {end_time}".ljust(left_label_width) + "     ".join(row))
 
     # Print statistics
-    print(separator)
-
-    print(f"Statistics full period {prices.index[0].strftime('%Y-%m-%d')} - {prices.index[-1].strftime('%Y-%m-%d')}:")
-    header2 = "".ljust(left_label_width) + " ".join(col.center(col_width) for col in prices.columns)
-    unit_row2 = "".ljust(left_label_width) + " ".join(f"[{prices.attrs['unit']}]".ljust(col_width) for _ in prices.columns)
-    print(header2)
-    print(unit_row2)
-    print(separator)
-    stats = prices.agg(['min', 'max', 'mean'])
-    print("Min:".ljust(left_label_width) + "     ".join(f"{stats.at['min', col]:8.2f}" for col in prices.columns))
-    print("Max:".ljust(left_label_width) + "     ".join(f"{stats.at['max', col]:8.2f}" for col in prices.columns))
-    print("Average:".ljust(left_label_width) + "     ".join(f"{stats.at['mean', col]:8.2f}" for col in prices.columns))
-
-
-# Call the function with the prices dataframe
-print_price_analysis(prices)
+    lines.append(separator)
+
+    lines.append(f"Statistics full period {prices.index[0].strftime('%Y-%m-%d')} - {prices.index[-1].strftime('%Y-%m-%d')}:")
+    lines.append("".ljust(left_label_width) + column_headers)
+    lines.append(unit_row)
+    lines.append(separator)
+    # Column statistics straight from the underlying array, skipping missing values like pandas does
+    # Columns without any prices give NaN, silently as in pandas
+    price_values = prices.to_numpy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        price_min = np.nanmin(price_values, axis=0)
+        price_max = np.nanmax(price_values, axis=0)
+        price_mean = np.nanmean(price_values, axis=0)
+    lines.append("Min:".ljust(left_label_width) + "     ".join(f"{value:8.2f}" for value in price_min))
+    lines.append("Max:".ljust(left_label_width) + "     ".join(f"{value:8.2f}" for value in price_max))
+    lines.append("Average:".ljust(left_label_width) + "     ".join(f"{value:8.2f}" for value in price_mean))
+
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    # Set the basic input to be used by fetch_day_ahead_prices
+    # start_time = "2024-12-12"
+    # end_time = "2024-12-13"
+    start_time = "DAY"
+    end_time = "LAST_SDAC"
+
+    start_date, end_date = utils.convert_date_range(start_time, end_time)
+
+    bidding_zones = ["DE", "nordics"]
+    convert_to_nok = False
+
+    # Validate the bidding zone list (not strictly nessecary)
+    bidding_zones_valid = utils.get_valid_bidding_zones(bidding_zones)
+
+    # Run the fetch_day_ahead_prices method and store results in the pandas dataframe prices
+    prices = core_functions.fetch_day_ahead_prices(
+        bidding_zones_valid, start_date, end_date, entso_e_token, convert_to_nok=convert_to_nok, resolution="60min"
+    )
+
+    # Call the function with the prices dataframe
+    print_price_analysis(prices)
@@ -0,0 +1,33 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from entsoe_price_extract_demo import print_price_analysis
+
+
+def _prices(periods=48):
+    index = pd.date_range("2024-12-12", periods=periods, freq="h", tz="Europe/Oslo")
+    prices = pd.DataFrame({"DE_LU": np.arange(periods, dtype=float), "NO_1": np.nan}, index=index)
+    prices.attrs["unit"] = "EUR/MWh"
+    return prices
+
+
+def test_print_price_analysis_all_nan_column_is_silent(capsys):
+    prices = _prices()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        print_price_analysis(prices)
+
+    statistics = capsys.readouterr().out.splitlines()[-3:]
+    expected = prices.agg(["min", "max", "mean"])
+    for line, stat in zip(statistics, ["min", "max", "mean"]):
+        assert line.split()[1:] == [f"{value:.2f}" for value in expected.loc[stat]]
+
+
+def test_print_price_analysis_lists_last_day(capsys):
+    print_price_analysis(_prices())
+
+    output = capsys.readouterr().out
+    assert "Prices on 2024-12-13:" in output
+    assert "23:00 - 00:00" in output
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+import utils
+
+
+def _freeze_now(monkeypatch, now):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now.replace(tzinfo=tz)
+
+    monkeypatch.setattr(utils, "datetime", FrozenDatetime)
+
+
+@pytest.mark.parametrize(
+    "today, reference, expected",
+    [
+        (datetime(2024, 2, 29), "DAY+M", "2024-03-29"),
+        (datetime(2024, 2, 29), "DAY+Y", "2025-02-28"),
+        (datetime(2024, 2, 29), "DAY-Y", "2023-02-28"),
+        (datetime(2024, 2, 29), "DAY-4Y", "2020-02-29"),
+        (datetime(2024, 1, 31), "DAY+M", "2024-02-29"),
+        (datetime(2023, 1, 31), "DAY+M", "2023-02-28"),
+        (datetime(2024, 1, 31), "DAY-2M", "2023-11-30"),
+        (datetime(2024, 1, 31), "DAY+12M", "2025-01-31"),
+        (datetime(2024, 1, 31), "DAY+Y", "2025-01-31"),
+    ],
+)
+def test_parse_date_reference_clamps_day_to_month_end(monkeypatch, today, reference, expected):
+    _freeze_now(monkeypatch, today.replace(hour=10))
+    assert utils.parse_date_reference(reference) == expected
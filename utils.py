@@ -1,18 +1,48 @@
-from datetime import datetime, timedelta
+from calendar import monthrange
+from datetime import date, datetime, timedelta
 import re
 import logging
-import pytz
+from functools import lru_cache
+from types import MappingProxyType
+from zoneinfo import ZoneInfo
 
 logger = logging.getLogger(__name__)
-        
+
+_OSLO_TZ = ZoneInfo("Europe/Oslo")
+
+# Regex patterns, compiled once at import
+_SHORT_BZ_RE = re.compile(r'^(NO|DK|SE)(\d+)$')
+# Matches "yyyy", "yyyy-mm", "yyyy-mm-dd" and "yyyy-mm-dd hh:mm", capturing each part
+_DATE_RE = re.compile(r"(\d{4})(?:-(\d{2})(?:-(\d{2})(?: (\d{2}):(\d{2}))?)?)?")
+
+# Bidding zones configuration, mapping keywords to the bidding zones they cover
+_bidding_zones_groups = {
+    "norway": frozenset({"NO_1", "NO_2", "NO_3", "NO_4", "NO_5"}),
+    "denmark": frozenset({"DK_1", "DK_2"}),
+    "sweden": frozenset({"SE_1", "SE_2", "SE_3", "SE_4"}),
+    "nordics": frozenset({"NO_1", "NO_2", "NO_3", "NO_4", "NO_5", "DK_1", "DK_2", "SE_1", "SE_2", "SE_3", "SE_4", "FI"}),
+    "baltics": frozenset({"EE", "LT", "LV"}),
+    "DE": frozenset({"DE_LU"}),
+    "cwe": frozenset({"DE_LU", "AT", "BE", "FR", "NL", "PL"}),
+    "nsl": frozenset({"NO_2_NSL"}),
+}
+_bidding_zones_groups["all"] = frozenset().union(*_bidding_zones_groups.values())
+# Read-only view, so the shared configuration cannot be altered by callers
+_BIDDING_ZONES_CONFIG = MappingProxyType(_bidding_zones_groups)
+# All valid bidding zones, referenced directly on every validation
+_ALL_BIDDING_ZONES = _BIDDING_ZONES_CONFIG["all"]
+# Keywords that expand to groups of bidding zones
+_BIDDING_ZONES_KEYWORDS = frozenset(_BIDDING_ZONES_CONFIG)
+
+
 def get_valid_bidding_zones(bidding_zone_input: list[str]):
     """'
     Retrieves valid bidding zones from a list of strings.
 
     Possible inputs include valid bidding zone names as defined in the bidding_zone_to_eic_code_map
-    of ext_api_config.py. Additionally, the keywords 'nordics' and 'norway' can be used to extract
-    the Nordic and Norwegian bidding zones, respectively. The keyword 'all' can be used to retrieve
-    all valid bidding zones.
+    of ext_api_config.py. Additionally, the keywords 'norway', 'denmark', 'sweden', 'nordics',
+    'baltics', 'cwe', 'DE' and 'nsl' can be used to extract the bidding zones of those groups.
+    The keyword 'all' can be used to retrieve all valid bidding zones.
 
     Args:
         bidding_zone_input (list[str]): A list of bidding zones to validate.
@@ -21,52 +51,72 @@ def get_valid_bidding_zones(bidding_zone_input: list[str]):
         list[str]: A list of valid bidding zones. If no valid zones are provided,
                    an empty list is returned and a message is printed.
     """
-    # Support bidding zone input as ["BZ1,BZ2","BZ3"], in addition to regular list
-    bidding_zone_input_split = [bz for sublist in bidding_zone_input for bz in sublist.split(",")]
-    use_bidding_zone_set = set(bidding_zone_input_split)
-
-    # Define the bidding zones configuration
-    bidding_zones_config = {
-        "norway": {"NO_1", "NO_2", "NO_3", "NO_4", "NO_5"},
-        "denmark": {"DK_1", "DK_2"},
-        "sweden": {"SE_1", "SE_2", "SE_3", "SE_4"},
-        "nordics": {"NO_1", "NO_2", "NO_3", "NO_4", "NO_5", "DK_1", "DK_2", "SE_1", "SE_2", "SE_3", "SE_4", "FI"},
-        "baltics": {"EE", "LT", "LV"},
-        "DE": {"DE_LU"},
-        "cwe": {"DE_LU", "AT", "BE", "FR", "NL", "PL"},
-        "nsl": {"NO_2_NSL"},
-    }
-    bidding_zones_config["all"] = set().union(*bidding_zones_config.values())
-
-    # Add support for shorthand inputs like "NO2", "DK1", "SE3" and plain "DE" -> "DE_LU"
-    use_bidding_zone_set.update({
-        f"{m.group(1)}_{int(m.group(2))}" 
-        for bz in {bz.strip().upper() for bz in use_bidding_zone_set} 
-        if (m := re.match(r'^(NO|DK|SE)(\d+)$', bz))
-    })
-    if 'DE' in use_bidding_zone_set:
-        use_bidding_zone_set.add('DE_LU')
-
-    # Include all relevant bidding zones based on input
-    for key in ["norway", "nordics", "DE", "cwe", "all"]:
-        if key in use_bidding_zone_set:
-            use_bidding_zone_set.update(bidding_zones_config[key])
+    # The lookup is cached on the (hashable) input, a new list is returned so callers may modify it
+    use_bidding_zone_list = list(_get_valid_bidding_zones(tuple(bidding_zone_input)))
 
-    # Ensure the final set only contains valid bidding zones
-    use_bidding_zone_set &= bidding_zones_config["all"]
-
-    # Check if the resulting set is empty and print a message if so
-    if len(use_bidding_zone_set) == 0:
+    # Check if the resulting list is empty and print a message if so
+    if len(use_bidding_zone_list) == 0:
         logger.warning(
             f"No valid bidding zones provided (input: {bidding_zone_input})")
-        logger.info(f"Please use at least one of the following: {bidding_zones_config['all']}")
+        logger.info(f"Please use at least one of the following: {sorted(_ALL_BIDDING_ZONES)}")
 
-    # Return the list of (sorted) valid bidding zones
-    use_bidding_zone_list = list(use_bidding_zone_set)
-    use_bidding_zone_list.sort()
     return use_bidding_zone_list
 
 
+@lru_cache(maxsize=128)
+def _get_valid_bidding_zones(bidding_zone_input: tuple[str, ...]):
+    """
+    Cached implementation of get_valid_bidding_zones, returning a sorted tuple of valid bidding zones.
+    """
+    # Support bidding zone input as ["BZ1,BZ2","BZ3"], in addition to regular list
+    joined_bidding_zone_input = ",".join(bidding_zone_input)
+    use_bidding_zone_set = set(joined_bidding_zone_input.split(","))
+
+    # Fast path for input that only contains valid bidding zone names
+    if use_bidding_zone_set and use_bidding_zone_set <= _ALL_BIDDING_ZONES:
+        return tuple(sorted(use_bidding_zone_set))
+
+    # The keyword "all" covers every other input, so no further expansion is needed
+    if "all" in use_bidding_zone_set:
+        return tuple(sorted(_ALL_BIDDING_ZONES))
+
+    # Add support for shorthand inputs like "NO2", "DK1", "SE3", matching each input in a single
+    # pass. The input is upper-cased once as a whole, while keywords are looked up as given below
+    shorthand_bidding_zones = []
+    for bz in set(joined_bidding_zone_input.upper().split(",")):
+        m = _SHORT_BZ_RE.match(bz.strip())
+        if m:
+            shorthand_bidding_zones.append(f"{m.group(1)}_{int(m.group(2))}")
+    use_bidding_zone_set.update(shorthand_bidding_zones)
+
+    # Expand keywords (including plain "DE" -> "DE_LU") to the bidding zones they cover. Only
+    # the keywords present in the input are visited, and they are dropped again below
+    for keyword in use_bidding_zone_set & _BIDDING_ZONES_KEYWORDS:
+        use_bidding_zone_set |= _BIDDING_ZONES_CONFIG[keyword]
+
+    # Ensure the final set only contains valid bidding zones
+    use_bidding_zone_set &= _ALL_BIDDING_ZONES
+
+    # Return the (sorted) valid bidding zones
+    return tuple(sorted(use_bidding_zone_set))
+
+
+# Base date of each special date reference, computed from the current time
+_BASE_FNS = {
+    # Today's date
+    'DAY': lambda today: today,
+    # The first day of the current month
+    'MONTH': lambda today: today.replace(day=1),
+    # The first day of the current week (Monday)
+    'WEEK': lambda today: date.fromordinal(today.toordinal() - today.weekday()),
+    # The first day of the current year
+    'YEAR': lambda today: today.replace(month=1, day=1),
+}
+
+# Special date references without increments
+_PLAIN_DATE_REFERENCES = frozenset({'LAST_SDAC', *_BASE_FNS})
+
+
 def parse_date_reference(reference):
     """
     Parses a date reference string and returns a formatted date string.
@@ -87,6 +137,9 @@ def parse_date_reference(reference):
     - "MONTH+N" or "MONTH-N": Adds or subtracts N months from today.
     - "YEAR+N" or "YEAR-N": Adds or subtracts N years from today.
     N can be either xD, xW, xM or xY, where x is either "" or an integer.
+    Month and year increments keep the day of the month, clamped to the last day of the
+    resulting month, e.g. "DAY+M" on January 31st gives the last day of February, and
+    "DAY+Y" on February 29th gives February 28th.
     Examples: "DAY+2D", "WEEK-2W", "MONTH+3W", "YEAR-Y"
 
     Args:
@@ -96,60 +149,76 @@ def parse_date_reference(reference):
     Raises:
         ValueError: If the reference string does not match any valid format or special reference.
     """
-    today = datetime.now(pytz.timezone("Europe/Oslo"))
-    
-    # Define regex patterns for valid date formats
-    valid_formats = [
-        r"^\d{4}$",  # yyyy
-        r"^\d{4}-\d{2}$",  # yyyy-mm
-        r"^\d{4}-\d{2}-\d{2}$",  # yyyy-mm-dd
-        r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$"  # yyyy-mm-dd hh:mm
-    ]
-
-    # Check if the reference matches any of the valid formats
-    for pattern in valid_formats:
-        if re.match(pattern, reference):
-            # Parse the date based on the matched format
-            if pattern == valid_formats[0]:
-                return datetime.strptime(reference, "%Y").strftime('%Y-%m-%d')
-            elif pattern == valid_formats[1]:
-                return datetime.strptime(reference, "%Y-%m").strftime('%Y-%m-%d')
-            elif pattern == valid_formats[2]:
-                return datetime.strptime(reference, "%Y-%m-%d").strftime('%Y-%m-%d')
-            elif pattern == valid_formats[3]:
-                return datetime.strptime(reference, "%Y-%m-%d %H:%M").strftime('%Y-%m-%d')
+    return _parse_date_reference_to_date(reference).strftime('%Y-%m-%d')
 
+
+def _parse_date_reference_to_date(reference):
+    """
+    Parses a date reference string, see parse_date_reference.
+
+    Args:
+        reference (str): The date reference string to parse.
+    Returns:
+        date: The parsed date.
+    Raises:
+        ValueError: If the reference string does not match any valid format or special reference.
+    """
+    # Plain keywords, the most common input, skip the date format matching
+    date_match = None if reference in _PLAIN_DATE_REFERENCES else _DATE_RE.fullmatch(reference)
+
+    # Check if the reference matches one of the valid formats, and build the date from the
+    # matched parts. Missing parts default to the start of the period, and datetime raises
+    # a ValueError for out of range values
+    if date_match:
+        year, month, day, hour, minute = date_match.groups()
+        return datetime(
+            int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0)
+        ).date()
+
+    # Special date references are relative to the current time in Oslo. They only change with
+    # the date and at 13:00, so they are resolved once per reference and cached
+    now = datetime.now(_OSLO_TZ)
+    return _parse_relative_date_reference(reference, now.date(), now.hour >= 13)
+
+
+@lru_cache(maxsize=256)
+def _parse_relative_date_reference(reference, today, sdac_published):
+    """
+    Parses a special date reference, see parse_date_reference.
+
+    Args:
+        reference (str): The special date reference string to parse.
+        today (date): The current date in Oslo.
+        sdac_published (bool): Whether the current time in Oslo is 13:00 or later.
+    Returns:
+        date: The parsed date.
+    Raises:
+        ValueError: If the reference string does not match any special reference.
+    """
     # Check for special date references 
-    base_date = None
     if reference == 'LAST_SDAC':
         # If the current time is before 13:00, return the next day
         # Otherwise, return the day after tomorrow
-        if today.hour < 13:
-            base_date = today + timedelta(days=1)
-        else:
-            base_date = today + timedelta(days=2)
-        return base_date.strftime('%Y-%m-%d')
-    elif reference.startswith('DAY'):
-        # Return today's date
-        base_date = today
-    elif reference.startswith('MONTH'):
-        # Return the first day of the current month
-        base_date = today.replace(day=1)
-    elif reference.startswith('WEEK'):
-        # Return the first day of the current week (Monday)
-        base_date = today - timedelta(days=today.weekday())
-    elif reference.startswith('YEAR'):
-        # Return the first day of the current year
-        base_date = today.replace(month=1, day=1)
-    else:
+        return today + timedelta(days=1 + sdac_published)
+
+    # Look up the base reference by its prefix ("DAY", "WEEK", "YEAR" or "MONTH")
+    prefix = reference[:3] if reference[:3] in _BASE_FNS else reference[:4] if reference[:4] in _BASE_FNS else reference[:5]
+    base_fn = _BASE_FNS.get(prefix)
+    if base_fn is None:
         raise ValueError(f"Invalid date reference: {reference}")
+    base_date = base_fn(today)
 
-    if '+' in reference or '-' in reference:
-        # Split the reference into base and increment parts
-        parts = re.split(r'(\+|-)', reference)
-        increment = parts[-1]
-        sign = 1 if '+' in reference else -1
+    # Split the reference into base and increment parts
+    if '+' in reference:
+        _, _, increment = reference.partition('+')
+        sign = 1
+    elif '-' in reference:
+        _, _, increment = reference.partition('-')
+        sign = -1
+    else:
+        increment = None
 
+    if increment is not None:
         if increment.endswith('D'):
             # Add or subtract days
             days = int(increment[:-1]) if increment[:-1] != '' else 1
@@ -161,23 +230,21 @@ def parse_date_reference(reference):
         elif increment.endswith('M'):
             # Add or subtract months
             months = int(increment[:-1]) if increment[:-1] else 1
-            for _ in range(abs(months)):
-                if sign == 1:
-                    if base_date.month == 12:
-                        base_date = base_date.replace(year=base_date.year + 1, month=1)
-                    else:
-                        base_date = base_date.replace(month=base_date.month + 1)
-                else:
-                    if base_date.month == 1:
-                        base_date = base_date.replace(year=base_date.year - 1, month=12)
-                    else:
-                        base_date = base_date.replace(month=base_date.month - 1)
+            # Count months from year 0, and clamp the day to the length of the new month
+            total_months = base_date.year * 12 + (base_date.month - 1) + months * sign
+            new_year, new_month = divmod(total_months, 12)
+            new_month += 1
+            new_day = min(base_date.day, monthrange(new_year, new_month)[1])
+            base_date = base_date.replace(year=new_year, month=new_month, day=new_day)
         elif increment.endswith('Y'):
             # Add or subtract years
             years = int(increment[:-1]) if increment[:-1] else 1
-            base_date = base_date.replace(year=base_date.year + (years * sign))
+            # Clamp the day, as 29 February does not exist in the new year unless it is a leap year
+            new_year = base_date.year + (years * sign)
+            new_day = min(base_date.day, monthrange(new_year, base_date.month)[1])
+            base_date = base_date.replace(year=new_year, day=new_day)
 
-    return base_date.strftime('%Y-%m-%d')
+    return base_date
 
 def convert_date_range(start, end):
     """
@@ -193,17 +260,13 @@ def convert_date_range(start, end):
     Raises:
         ValueError: If the start date is not before the end date or if they are not at least one day apart.
     """
-    start_date = parse_date_reference(start)
-    end_date = parse_date_reference(end)
-
-    # Convert the dates to datetime objects for comparison
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d')
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
+    # Parse the references to date objects for comparison, and format them once checked
+    start_date_obj = _parse_date_reference_to_date(start)
+    end_date_obj = _parse_date_reference_to_date(end)
 
     # Check if the start date is before the end date and at least one day apart
+    # Dates are day granular, so being before the end date also means at least one day apart
     if start_date_obj >= end_date_obj:
         raise ValueError("The start date must be before the end date and at least one day apart.")
-    if (end_date_obj - start_date_obj).days < 1:
-        raise ValueError("The start date must be before the end date and at least one day apart.")
 
-    return start_date, end_date
\ No newline at end of file
+    return start_date_obj.strftime('%Y-%m-%d'), end_date_obj.strftime('%Y-%m-%d')
\ No newline at end of file